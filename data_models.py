@@ -1,17 +1,27 @@
 # subagents/progress_tracking_agent/data_models.py
 
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Union
+import msgspec
+from array import array
+from pydantic import BaseModel, ConfigDict, Field, WithJsonSchema
+from typing import Annotated, Any, List, Optional, Dict, Type, Union
 from datetime import datetime
 import uuid # Although not used in these specific models, keep if other agents need it
-import statistics # Keep here as it might be used for future model methods
 
-class StudentProgressSettings(BaseModel):
-    """Settings related to progress tracking for a student"""
+class StudentProgressSettingsIn(BaseModel):
+    """Settings payload accepted by the API (range-checked)"""
     student_id: str
     success_threshold: float = Field(default=80.0, ge=0, le=100, description="Student's definition of success %")
     learning_goals: List[str] = Field(default=[], description="Student's primary learning goals")
 
+class StudentProgressSettings(BaseModel):
+    """Settings related to progress tracking for a student.
+    Internal copy, no range validators: values are checked once on the way in via StudentProgressSettingsIn."""
+    model_config = ConfigDict(revalidate_instances="never")
+
+    student_id: str
+    success_threshold: float = Field(default=80.0, description="Student's definition of success %")
+    learning_goals: List[str] = Field(default=[], description="Student's primary learning goals")
+
 class ProgressEventInput(BaseModel):
     """Input for reporting a progress event"""
     student_id: str
@@ -22,19 +32,38 @@ class ProgressEventInput(BaseModel):
     duration_minutes: Optional[int] = Field(default=None, ge=0) # e.g., Time spent on topic/resource
     details: Optional[Dict] = Field(default=None) # e.g., {'quiz_id': 'q123', 'attempts': 1}
 
-class TopicProgressData(BaseModel):
-    """Stores aggregated progress data for a single topic"""
+class TopicProgressData(msgspec.Struct, kw_only=True, dict=True):
+    """Stores aggregated progress data for a single topic.
+    Internal only and mutated on every event, so it's a msgspec Struct rather than a Pydantic model."""
     topic_id: str
-    status: str = Field(default="Not Started", description="e.g., Not Started, In Progress, Completed, Needs Review")
+    status: str = "Not Started" # e.g., Not Started, In Progress, Completed, Needs Review
     attempts: int = 0
-    scores: List[float] = Field(default=[]) # Store all scores
+    scores: array = msgspec.field(default_factory=lambda: array("d")) # Store all scores, packed as C doubles
     average_score: Optional[float] = None
     total_time_minutes: int = 0
     last_activity_type: Optional[str] = None
-    last_updated: datetime = Field(default_factory=datetime.now)
+    last_updated: datetime # Set from the creating event's timestamp, no clock read per topic
+
+    def __post_init__(self):
+        if not isinstance(self.scores, array):
+            self.scores = array("d", self.scores)
+        # Running total of scores, keeps the average O(1) per event (not an encoded field)
+        self._score_sum: float = sum(self.scores)
+        # Memoized prompt breakdown line, reset whenever the topic changes
+        self._breakdown_cache: Optional[str] = None
+
+    def breakdown_line(self) -> str:
+        """This topic's line in the LLM insight prompt, rendered once per change."""
+        if self._breakdown_cache is None:
+            if self.average_score is not None:
+                self._breakdown_cache = f"- {self.topic_id}: Status='{self.status}', Avg Score={self.average_score:.1f}%, Attempts={self.attempts}"
+            else:
+                self._breakdown_cache = f"- {self.topic_id}: Status='{self.status}', Attempts={self.attempts}"
+        return self._breakdown_cache
 
     def update_progress(self, event: ProgressEventInput):
         """Updates topic progress based on an incoming event."""
+        self._breakdown_cache = None
         self.last_updated = event.timestamp
         self.last_activity_type = event.event_type
         # Only set to In Progress if Not Started, allow Completed/Needs Review to persist
@@ -43,12 +72,9 @@ class TopicProgressData(BaseModel):
 
         if event.event_type == 'quiz_attempted' and event.score is not None:
             self.attempts += event.details.get('attempts', 1) if event.details else 1
+            self._score_sum += event.score
             self.scores.append(event.score)
-            if self.scores:
-                 # Use statistics module correctly
-                 self.average_score = round(statistics.mean(self.scores), 1)
-            else:
-                 self.average_score = None
+            self.average_score = round(self._score_sum / len(self.scores), 1)
         elif event.event_type == 'topic_completed':
             self.status = "Completed"
         elif event.event_type == 'session_duration_minutes' and event.duration_minutes is not None:
@@ -56,13 +82,40 @@ class TopicProgressData(BaseModel):
         elif event.event_type == 'needs_review': # Could be triggered by low score logic
              self.status = "Needs Review"
 
+def msgspec_enc_hook(obj: Any) -> Any:
+    """Encodes types msgspec doesn't support natively (score arrays -> lists)."""
+    if isinstance(obj, array):
+        return obj.tolist()
+    raise NotImplementedError(f"Objects of type {type(obj)} are not supported")
+
+def msgspec_dec_hook(type_: Type, obj: Any) -> Any:
+    """Decodes types msgspec doesn't support natively (lists -> score arrays)."""
+    if type_ is array:
+        return array("d", obj)
+    raise NotImplementedError(f"Objects of type {type_} are not supported")
+
+class TopicProgressOut(BaseModel):
+    """API shape of TopicProgressData, documents the items of ProgressSummaryOutput.topics_progress"""
+    topic_id: str
+    status: str = Field(default="Not Started", description="e.g., Not Started, In Progress, Completed, Needs Review")
+    attempts: int = 0
+    scores: List[float] = Field(default=[])
+    average_score: Optional[float] = None
+    total_time_minutes: int = 0
+    last_activity_type: Optional[str] = None
+    last_updated: datetime
+
 class ProgressSummaryOutput(BaseModel):
     """Output structure for the GET /progress endpoint"""
+    # Built from trusted internal data; never revalidate/copy it (incl. the topics list) if passed back through validation
+    model_config = ConfigDict(revalidate_instances="never")
+
     student_id: str
     overall_completion_percent: float = 0.0
     average_score_all: Optional[float] = None
     total_study_time_minutes: int = 0
-    topics_progress: List[TopicProgressData] = Field(default=[])
+    # TopicProgressData converted via msgspec.to_builtins; the dicts are served as-is, with TopicProgressOut as their schema
+    topics_progress: List[Annotated[Dict[str, Any], WithJsonSchema(TopicProgressOut.model_json_schema())]] = Field(default=[])
     identified_weaknesses: List[str] = Field(default=[], description="List of topic_ids flagged as weak")
     llm_insights: Optional[str] = None
     generated_at: datetime = Field(default_factory=datetime.now)
\ No newline at end of file
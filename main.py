@@ -1,56 +1,162 @@
 # --- existing code unchanged above this ---
 
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Depends, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.coder import JsonCoder
+from fastapi_cache.decorator import cache
+from pydantic import BaseModel, ValidationError
+from redis import asyncio as aioredis
+from contextlib import asynccontextmanager
+from functools import wraps
 from typing import Dict, List, Optional
 from datetime import datetime
 import traceback
+import email.message
+import logging
 import os
 
+# Processor debug logging (per-event/request) stays off at the default INFO level
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
 try:
-    from .data_models import StudentProgressSettings, ProgressEventInput, ProgressSummaryOutput
+    from .data_models import StudentProgressSettings, StudentProgressSettingsIn, ProgressEventInput, ProgressSummaryOutput
 except ImportError:
-     from data_models import StudentProgressSettings, ProgressEventInput, ProgressSummaryOutput
+     from data_models import StudentProgressSettings, StudentProgressSettingsIn, ProgressEventInput, ProgressSummaryOutput
 
 try:
-    from .processor import ProgressProcessor
+    from .processor import ProgressProcessor, summary_cache_key, SUMMARY_CACHE_EXPIRE_SECONDS
+    from .storage import RedisProgressStore
 except ImportError:
-     from processor import ProgressProcessor
+     from processor import ProgressProcessor, summary_cache_key, SUMMARY_CACHE_EXPIRE_SECONDS
+     from storage import RedisProgressStore
+
+REDIS_URL = os.environ.get("REDIS_URL")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Summary cache and progress state: Redis when configured (shared across workers), in-process otherwise
+    redis = aioredis.from_url(REDIS_URL) if REDIS_URL else None
+    FastAPICache.init(RedisBackend(redis) if redis else SweepingInMemoryBackend(), prefix="progress")
+    # The processor (and its LLM client) is built once per worker here rather than at import time
+    app.state.processor = ProgressProcessor(store=RedisProgressStore(redis) if redis else None)
+    yield
+    await app.state.processor.stop() # Apply anything still queued before shutting down
+    if redis:
+        await redis.aclose()
+
+class SweepingInMemoryBackend(InMemoryBackend):
+    """InMemoryBackend only drops an expired entry when that same key is read again, and summary keys of
+    past generations never are. Expired entries are also swept on write, at most once per cache lifetime."""
+    _next_sweep = 0
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        await super().set(key, value, expire)
+        now = self._now
+        if now < self._next_sweep:
+            return
+        async with self._lock:
+            for expired in [k for k, v in self._store.items() if v.ttl_ts < now]:
+                del self._store[expired]
+        self._next_sweep = now + SUMMARY_CACHE_EXPIRE_SECONDS
+
+class RawJSONCoder(JsonCoder):
+    """Stores the rendered JSON body and serves cache hits as-is, without a decode/re-encode round trip."""
+    @classmethod
+    def encode(cls, value) -> bytes:
+        if isinstance(value, BaseModel):
+            return value.model_dump_json().encode()
+        return super().encode(value)
 
-app = FastAPI(title="Progress Tracking Agent V2.2 (Refactored - Class Based)")
+    @classmethod
+    def decode_as_type(cls, value: bytes, *, type_=None):
+        return Response(content=value, media_type="application/json")
 
-processor = ProgressProcessor()
+async def summary_key_builder(func, namespace: str = "", *, request=None, response=None, args=(), kwargs=None) -> str:
+    # Keyed on the student's generation, so a summary cached after a write but computed before it is never served
+    student_id = kwargs["student_id"]
+    return summary_cache_key(student_id, await kwargs["processor"].summary_generation(student_id))
+
+def keep_cache_headers(endpoint):
+    """Cache hits come back as the Response built by RawJSONCoder, and FastAPI ignores the headers fastapi-cache
+    set on the injected response whenever an endpoint returns a Response. Copies them over."""
+    @wraps(endpoint)
+    async def inner(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        injected = kwargs.get("__fastapi_cache_response") # Added by @cache under its default dependency namespace
+        if isinstance(result, Response) and injected is not None and result is not injected:
+            result.headers.update(injected.headers)
+        return result
+    return inner
+
+app = FastAPI(title="Progress Tracking Agent V2.2 (Refactored - Class Based)", lifespan=lifespan)
+
+def get_processor(request: Request) -> ProgressProcessor:
+    return request.app.state.processor
 
 @app.post("/progress/settings/{student_id}", response_model=StudentProgressSettings, status_code=201)
-async def save_student_settings_endpoint(student_id: str, settings: StudentProgressSettings = Body(...)):
+async def save_student_settings_endpoint(student_id: str, settings: StudentProgressSettingsIn = Body(...), processor: ProgressProcessor = Depends(get_processor)):
     try:
-        saved_settings = await processor.save_settings(student_id, settings)
+        # Already range-checked by StudentProgressSettingsIn; the internal copy skips validation
+        saved_settings = await processor.save_settings(student_id, StudentProgressSettings.model_construct(**dict(settings)))
         return saved_settings
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"[API] Error saving settings for {student_id}: {e}")
+        logger.exception("[API] Error saving settings for %s", student_id)
         raise HTTPException(status_code=500, detail=f"Could not save settings: {e}")
 
+# GET endpoints keep response_model: FastAPI serializes it straight to JSON bytes via Pydantic,
+# and the internally built models aren't revalidated (revalidate_instances="never")
 @app.get("/progress/settings/{student_id}", response_model=StudentProgressSettings)
-async def get_student_settings_endpoint(student_id: str):
+async def get_student_settings_endpoint(student_id: str, processor: ProgressProcessor = Depends(get_processor)):
     try:
         settings = await processor.get_settings(student_id)
         return settings
     except Exception as e:
-        print(f"[API] Error getting settings for {student_id}: {e}")
+        logger.exception("[API] Error getting settings for %s", student_id)
         raise HTTPException(status_code=500, detail=f"Could not retrieve settings: {e}")
 
-@app.post("/progress/update", status_code=200)
-async def update_progress_endpoint(event: ProgressEventInput = Body(...)):
+def _is_json_content_type(content_type: Optional[str]) -> bool:
+    """Mirrors FastAPI's strict Content-Type check for JSON bodies (application/json or application/*+json)."""
+    if not content_type:
+        return False
+    message = email.message.Message()
+    message["content-type"] = content_type
+    subtype = message.get_content_subtype()
+    return message.get_content_maintype() == "application" and (subtype == "json" or subtype.endswith("+json"))
+
+# Body is validated straight from the raw bytes (one pass, no intermediate dict);
+# openapi_extra keeps the request schema in the docs
+@app.post("/progress/update", status_code=202, openapi_extra={
+    "requestBody": {"required": True, "content": {"application/json": {"schema": ProgressEventInput.model_json_schema()}}}
+})
+async def update_progress_endpoint(request: Request, processor: ProgressProcessor = Depends(get_processor)):
+    try:
+        body = await request.body()
+        if _is_json_content_type(request.headers.get("content-type")):
+            event = ProgressEventInput.model_validate_json(body)
+        else:
+            # Same 422 FastAPI's own body parsing gives non-JSON payloads: the raw bytes aren't an object
+            event = ProgressEventInput.model_validate(body)
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
     try:
-        await processor.update_topic_progress(event)
-        return {"message": "Progress updated successfully."}
+        # Applied in batches by the processor's background writer
+        await processor.enqueue_event(event)
+        return {"message": "Progress update queued."}
     except Exception as e:
-        print(f"[API] Error updating progress endpoint for student {event.student_id}: {e}")
+        logger.exception("[API] Error updating progress endpoint for student %s", event.student_id)
         raise HTTPException(status_code=500, detail=f"Failed to update progress: {e}")
 
 @app.get("/progress/{student_id}", response_model=ProgressSummaryOutput)
-async def get_progress_endpoint(student_id: str):
+@keep_cache_headers
+@cache(expire=SUMMARY_CACHE_EXPIRE_SECONDS, coder=RawJSONCoder, key_builder=summary_key_builder)
+async def get_progress_endpoint(student_id: str, processor: ProgressProcessor = Depends(get_processor)):
     try:
         summary = await processor.get_progress_summary(student_id)
         return summary
@@ -59,11 +165,11 @@ async def get_progress_endpoint(student_id: str):
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        print(f"[API] Error getting progress summary endpoint for student {student_id}: {e}")
+        logger.exception("[API] Error getting progress summary endpoint for student %s", student_id)
         raise HTTPException(status_code=500, detail=f"Failed to get progress summary: {e}")
 
 @app.get("/")
-async def read_root():
+async def read_root(processor: ProgressProcessor = Depends(get_processor)):
     llm_status = "OK" if processor.LLM_AVAILABLE and processor.llm else "Unavailable/Error"
     return {"message": "Progress Tracking Agent is running (Refactored).", "llm_status": llm_status}
 
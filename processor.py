@@ -3,62 +3,68 @@
 import os
 import json
 import uuid
-from typing import List, Optional, Dict, Union
+from typing import Any, Awaitable, Callable, List, Optional, Dict, Tuple, Union
 from datetime import datetime, date
 from collections import defaultdict
-import statistics # Need this import
 from dotenv import load_dotenv
 import traceback
 import asyncio
+import logging
+import msgspec
+import weakref
+from array import array
+from fastapi_cache import FastAPICache
+
+logger = logging.getLogger(__name__)
 
 # --- Check and Import LLM Libraries ---
 LANGCHAIN_AVAILABLE_FLAG = False
 llm_client_class = None
-prompt_template_class = None
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
-    from langchain.prompts import PromptTemplate
     llm_client_class = ChatGoogleGenerativeAI
-    prompt_template_class = PromptTemplate
     LANGCHAIN_AVAILABLE_FLAG = True
 except ImportError:
-    print("WARNING: Langchain or Google GenAI not installed. LLM features will be disabled.")
+    logger.warning("Langchain or Google GenAI not installed. LLM features will be disabled.")
 
 # --- Relative Import for Models ---
 try:
     from .data_models import (
-        StudentProgressSettings, ProgressEventInput, TopicProgressData, ProgressSummaryOutput
+        StudentProgressSettings, ProgressEventInput, TopicProgressData, ProgressSummaryOutput, msgspec_enc_hook
     )
+    from .storage import RedisProgressStore
 except ImportError:
      from data_models import ( # Fallback
-        StudentProgressSettings, ProgressEventInput, TopicProgressData, ProgressSummaryOutput
+        StudentProgressSettings, ProgressEventInput, TopicProgressData, ProgressSummaryOutput, msgspec_enc_hook
     )
+     from storage import RedisProgressStore
 
 # --- Load Environment Variables ---
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-class ProgressProcessor:
-    """Encapsulates logic and data storage for the Progress Tracking Agent."""
+# --- Default Settings ---
+# Shared sentinel used when a student has no saved settings, so lookups don't build a new model each time
+_DEFAULT_SETTINGS = StudentProgressSettings.model_construct(student_id="")
 
-    def __init__(self):
-        """Initializes storage and the LLM client if configured."""
-        # --- In-memory storage (Managed by this processor instance) ---
-        self.progress_db: Dict[str, Dict[str, TopicProgressData]] = defaultdict(lambda: {})
-        self.student_settings_db: Dict[str, StudentProgressSettings] = {}
+# --- Event Queue ---
+# Events are queued by the API and applied by one background writer in chunks of up to this size
+EVENT_BATCH_SIZE = int(os.getenv("PROGRESS_EVENT_BATCH_SIZE", "128"))
+EVENT_QUEUE_MAXSIZE = 10_000 # put() waits once this many events are pending
 
-        # --- LLM Setup ---
-        self.llm: Optional[ChatGoogleGenerativeAI] = None
-        self.insight_prompt_template: Optional[PromptTemplate] = None
-        self.LLM_AVAILABLE: bool = False
+# --- Shared Store ---
+STORE_WRITE_ATTEMPTS = 5 # Reload-and-reapply rounds on version conflicts before giving up
 
-        if LANGCHAIN_AVAILABLE_FLAG and GOOGLE_API_KEY and llm_client_class and prompt_template_class:
-            try:
-                self.llm = llm_client_class(
-                    model="gemini-1.5-flash", google_api_key=GOOGLE_API_KEY, temperature=0.7
-                )
-                self.insight_prompt_template = prompt_template_class(
-                    template="""
+# --- Summary Cache ---
+SUMMARY_CACHE_EXPIRE_SECONDS = 60
+
+def summary_cache_key(student_id: str, generation: int) -> str:
+    """Cache key for a student's GET /progress summary. Must include student_id and their summary generation."""
+    return f"progress:summary:{student_id}:{generation}"
+
+# --- Insight Prompt ---
+# Plain str template filled with str.format; avoids PromptTemplate's per-call validation
+_INSIGHT_TEMPLATE: str = """
 You are an encouraging AI learning assistant (YoBuddy). Analyze the student's progress data provided below and generate a brief (2-4 sentences), positive, and insightful summary for the student.
 
 Student ID: {student_id}
@@ -83,24 +89,61 @@ Instructions for your summary:
 Example Tone: "Great job focusing on your goal to master Physics! You've really nailed 'Kinematics' with an average score of 92%, exceeding your 80% target. Keep an eye on 'Newton's Laws' (68%) – maybe try reviewing the key concepts there this week. You're making good progress overall!"
 
 Generate the summary now:
-""",
-                    input_variables=[
-                        "student_id", "learning_goals", "success_threshold",
-                        "overall_completion_percent", "average_score_all_str",
-                        "total_study_time_minutes", "topic_breakdown_str"
-                    ]
+"""
+
+class ProgressProcessor:
+    """Encapsulates logic and data storage for the Progress Tracking Agent."""
+
+    def __init__(self, store: Optional[RedisProgressStore] = None):
+        """Initializes storage and the LLM client if configured."""
+        # --- Shared storage (optional) ---
+        # When set, Redis is the source of truth and the dicts below are a per-worker copy,
+        # reloaded whenever the student's version in Redis moves past ours
+        self.store = store
+        self._versions: Dict[str, int] = {}
+        # Weak values: a student's lock lives only while someone holds or waits on it, so reads of unknown ids don't pile up
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+        # --- In-memory storage (Managed by this processor instance) ---
+        self.progress_db: Dict[str, Dict[str, TopicProgressData]] = defaultdict(lambda: {})
+        self.student_settings_db: Dict[str, StudentProgressSettings] = {}
+        # Per-student aggregates patched on every update so summaries don't rescan topics
+        self._agg: Dict[str, dict] = defaultdict(lambda: {"completed": 0, "score_sum": 0.0, "score_count": 0, "study_time": 0, "weak": set()})
+        # Flat per-student columns (SoA) mirroring the topic fields that full-scan loops read
+        self.progress_soa: Dict[str, dict] = defaultdict(lambda: {"topic_ids": [], "statuses": [], "avgs": array("d"), "idx": {}})
+        # Queued progress events and the background task that applies them
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_MAXSIZE)
+        self._drain_task: Optional[asyncio.Task] = None
+        # In-flight LLM insight calls by (student_id, prompt), so concurrent summaries of the same data share one request
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        # Bumped on every write so cached summaries from before it are never read again (see summary_generation)
+        self._summary_generations: Dict[str, int] = {}
+
+        # --- LLM Setup ---
+        self.llm: Optional[ChatGoogleGenerativeAI] = None
+        self.LLM_AVAILABLE: bool = False
+        self._init_llm()
+
+    def _init_llm(self):
+        """Creates the LLM client if configured. Idempotent: the client is only built once."""
+        if self.llm:
+            return
+        if LANGCHAIN_AVAILABLE_FLAG and GOOGLE_API_KEY and llm_client_class:
+            try:
+                self.llm = llm_client_class(
+                    model="gemini-1.5-flash", google_api_key=GOOGLE_API_KEY, temperature=0.7
                 )
                 self.LLM_AVAILABLE = True
-                print("ProgressProcessor: LLM Initialized successfully.")
+                logger.info("ProgressProcessor: LLM Initialized successfully.")
             except Exception as e:
-                print(f"ProgressProcessor ERROR: Failed LLM init: {e}")
+                logger.error("ProgressProcessor: Failed LLM init: %s", e)
                 self.LLM_AVAILABLE = False
                 self.llm = None
         else:
-            if not LANGCHAIN_AVAILABLE_FLAG: print("ProgressProcessor WARNING: LLM libraries not installed.")
-            if not GOOGLE_API_KEY: print("ProgressProcessor WARNING: GOOGLE_API_KEY missing.")
+            if not LANGCHAIN_AVAILABLE_FLAG: logger.warning("ProgressProcessor: LLM libraries not installed.")
+            if not GOOGLE_API_KEY: logger.warning("ProgressProcessor: GOOGLE_API_KEY missing.")
             self.LLM_AVAILABLE = False
-            print("ProgressProcessor WARNING: LLM features disabled.")
+            logger.warning("ProgressProcessor: LLM features disabled.")
 
     # --- Logic Methods (Async where needed) ---
     async def save_settings(self, student_id: str, settings: StudentProgressSettings) -> StudentProgressSettings:
@@ -108,40 +151,221 @@ Generate the summary now:
         if student_id != settings.student_id:
             # Use ValueError for internal logic errors, let endpoint handle HTTP Exception
             raise ValueError("Student ID in path does not match payload.")
-        # Replace with async DB write later
-        self.student_settings_db[student_id] = settings
-        print(f"[Processor] Settings saved for student: {student_id}")
+
+        def apply_settings():
+            previous_threshold = self.student_settings_db.get(student_id, _DEFAULT_SETTINGS).success_threshold
+            self.student_settings_db[student_id] = settings
+            # The weak set is kept up to date per event; only a threshold change means re-deriving it
+            # (scans the SoA columns, NaN avg = no scores)
+            threshold = settings.success_threshold
+            if threshold != previous_threshold and student_id in self.progress_soa:
+                soa = self.progress_soa[student_id]
+                self._agg[student_id]["weak"] = {
+                    topic_id for topic_id, status, avg in zip(soa["topic_ids"], soa["statuses"], soa["avgs"])
+                    if status == "Needs Review" or avg < threshold
+                }
+
+        async with self._lock_for(student_id):
+            await self._write_through(student_id, apply_settings, lambda expected, _: self.store.save_settings(settings, expected))
+        await self._invalidate_summary(student_id)
+        logger.debug("[Processor] Settings saved for student: %s", student_id)
         return settings
 
     async def get_settings(self, student_id: str) -> StudentProgressSettings:
         """Gets student settings or returns defaults."""
-        # Replace with async DB read later
+        async with self._lock_for(student_id):
+            await self._sync_student(student_id)
         if student_id in self.student_settings_db:
             return self.student_settings_db[student_id]
         else:
-            print(f"[Processor] No settings found for {student_id}, returning defaults.")
-            # Create and return default settings, but don't save them automatically
-            return StudentProgressSettings(student_id=student_id)
+            logger.debug("[Processor] No settings found for %s, returning defaults.", student_id)
+            # Return a copy of the default settings for this student, but don't save them automatically
+            # Fresh learning_goals list: a shallow copy would share (and let callers mutate) the sentinel's list
+            return _DEFAULT_SETTINGS.model_copy(update={"student_id": student_id, "learning_goals": []})
+
+    def _lock_for(self, student_id: str) -> asyncio.Lock:
+        """The student's lock, created on first use."""
+        lock = self._locks.get(student_id)
+        if lock is None:
+            lock = self._locks[student_id] = asyncio.Lock()
+        return lock
+
+    async def _sync_student(self, student_id: str):
+        """Reloads a student's state from the shared store if it changed since we last saw it. Call with the student's lock held."""
+        if self.store is None:
+            return
+        if await self.store.get_version(student_id) == self._versions.get(student_id, 0):
+            return
+        version, topics, settings = await self.store.load_student(student_id)
+        self.progress_db[student_id] = topics
+        if settings is not None:
+            self.student_settings_db[student_id] = settings
+        else:
+            self.student_settings_db.pop(student_id, None)
+        self._rebuild_derived(student_id)
+        self._versions[student_id] = version
+
+    async def _write_through(self, student_id: str, apply: Callable[[], Any], save: Callable[[int, Any], Awaitable[Optional[int]]]) -> Any:
+        """Applies a change to the in-memory state and, with a store, writes it only if nobody else wrote first.
+        On a version conflict the student is reloaded and the change applied again. Call with the student's lock held."""
+        for _ in range(STORE_WRITE_ATTEMPTS):
+            await self._sync_student(student_id)
+            result = apply()
+            if self.store is None:
+                return result
+            try:
+                version = await save(self._versions.get(student_id, 0), result)
+            except Exception:
+                self._versions[student_id] = -1 # Memory is now ahead of the store; reload on next access
+                raise
+            if version is not None:
+                self._versions[student_id] = version
+                return result
+            self._versions[student_id] = -1 # Another worker wrote first; reload and apply again
+        raise RuntimeError(f"Gave up writing progress for {student_id} after {STORE_WRITE_ATTEMPTS} version conflicts.")
+
+    def _rebuild_derived(self, student_id: str):
+        """Recomputes a student's aggregates and SoA columns from their topics."""
+        self._agg.pop(student_id, None)
+        self.progress_soa.pop(student_id, None)
+        threshold = self.student_settings_db.get(student_id, _DEFAULT_SETTINGS).success_threshold
+        agg = self._agg[student_id]
+        for topic in self.progress_db[student_id].values():
+            if topic.status == "Completed":
+                agg["completed"] += 1
+            agg["score_sum"] += topic._score_sum
+            agg["score_count"] += len(topic.scores)
+            agg["study_time"] += topic.total_time_minutes
+            if self._is_weak(topic, threshold):
+                agg["weak"].add(topic.topic_id)
+            self._mirror_soa(student_id, topic)
+
+    async def summary_generation(self, student_id: str) -> int:
+        """Changes on every write for the student; part of the summary cache key.
+        With a store this is the shared version, so every worker agrees on it."""
+        if self.store is not None:
+            return await self.store.get_version(student_id)
+        return self._summary_generations.get(student_id, 0)
+
+    async def _invalidate_summary(self, student_id: str):
+        """Moves the student to a new summary generation. Deleting the cached entry alone would race with
+        a summary computed before this write and cached after it; under the new key that entry is never read.
+        The previous generation's entry is dropped here; anything cached under it afterwards just expires."""
+        previous = self._summary_generations.get(student_id, 0)
+        self._summary_generations[student_id] = previous + 1
+        if self.store is not None:
+            return # Generations are store versions there, and the Redis cache backend expires old keys itself
+        try:
+            await FastAPICache.get_backend().clear(key=summary_cache_key(student_id, previous))
+        except (AssertionError, KeyError):
+            pass # Cache not initialised, or nothing cached for that generation
+
+    def _mirror_soa(self, student_id: str, topic: TopicProgressData):
+        """Writes a topic's status/average into the student's SoA columns."""
+        soa = self.progress_soa[student_id]
+        avg = topic.average_score if topic.average_score is not None else float("nan")
+        i = soa["idx"].get(topic.topic_id)
+        if i is None:
+            soa["idx"][topic.topic_id] = len(soa["topic_ids"])
+            soa["topic_ids"].append(topic.topic_id)
+            soa["statuses"].append(topic.status)
+            soa["avgs"].append(avg)
+        else:
+            soa["statuses"][i] = topic.status
+            soa["avgs"][i] = avg
+
+    @staticmethod
+    def _is_weak(topic: TopicProgressData, threshold: float) -> bool:
+        """A topic is weak if flagged for review or averaging below the student's threshold."""
+        return topic.status == "Needs Review" or (topic.average_score is not None and topic.average_score < threshold)
+
+    async def enqueue_event(self, event: ProgressEventInput):
+        """Queues an event for the background writer, starting it on first use."""
+        self._ensure_drain()
+        await self._queue.put(event)
+
+    def _ensure_drain(self):
+        """Starts the background writer, or restarts it if it died, so queued events never sit unapplied."""
+        task = self._drain_task
+        if task is not None and not task.done():
+            return
+        if task is not None and not task.cancelled() and task.exception() is not None:
+            logger.error("[Processor] Background writer died, restarting it", exc_info=task.exception())
+        self._drain_task = asyncio.create_task(self._drain())
+
+    async def stop(self):
+        """Waits for queued events to be applied, then stops the background writer."""
+        if self._drain_task is None:
+            return
+        self._ensure_drain() # A dead writer would leave join() waiting forever
+        await self._queue.join()
+        self._drain_task.cancel()
+        try:
+            await self._drain_task
+        except asyncio.CancelledError:
+            pass
+        self._drain_task = None
+
+    async def _drain(self):
+        """Background writer: takes up to EVENT_BATCH_SIZE queued events at a time and applies them per student."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < EVENT_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                events_by_student: Dict[str, List[ProgressEventInput]] = defaultdict(list)
+                for event in batch:
+                    events_by_student[event.student_id].append(event)
+                for student_id, events in events_by_student.items():
+                    try:
+                        await self._apply_student_events(student_id, events)
+                    except Exception as e:
+                        logger.exception("[Processor] Error applying %d queued events for %s: %s", len(events), student_id, e)
+                logger.debug("[Processor] Applied %d queued events for %d students", len(batch), len(events_by_student))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
 
-    # This method only updates in-memory dicts based on input, no async I/O needed *yet*
-    # Making it async allows easier integration if DB calls are added later
     async def update_topic_progress(self, event: ProgressEventInput):
         """Handles incoming progress events, updates storage, checks thresholds."""
+        await self._apply_student_events(event.student_id, [event])
+
+    async def _apply_student_events(self, student_id: str, events: List[ProgressEventInput]):
+        """Applies a student's events in order, with one store sync/write and cache invalidation for the lot."""
+        def apply_events() -> Dict[str, TopicProgressData]:
+            touched = {}
+            for event in events:
+                topic_progress = self._apply_event(event)
+                touched[topic_progress.topic_id] = topic_progress
+            return touched
+
+        async with self._lock_for(student_id):
+            await self._write_through(
+                student_id, apply_events,
+                lambda expected, touched: self.store.save_topics(student_id, touched.values(), expected)
+            )
+        await self._invalidate_summary(student_id)
+
+    def _apply_event(self, event: ProgressEventInput) -> TopicProgressData:
+        """Applies one event to the in-memory topic, aggregates and SoA columns. Returns the updated topic."""
         student_id = event.student_id
         topic_id = event.topic_id
-        print(f"[Processor] Updating progress for {student_id}, topic {topic_id}, event {event.event_type}")
+        logger.debug("[Processor] Updating progress for %s, topic %s, event %s", student_id, topic_id, event.event_type)
 
         # Access internal storage
         student_data = self.progress_db[student_id]
         if topic_id not in student_data:
-            student_data[topic_id] = TopicProgressData(topic_id=topic_id)
+            student_data[topic_id] = TopicProgressData(topic_id=topic_id, last_updated=event.timestamp)
 
         topic_progress = student_data[topic_id]
+        # Snapshot the fields the aggregates depend on, so we can apply just the delta
+        was_completed = topic_progress.status == "Completed"
+        prev_score_count = len(topic_progress.scores)
+        prev_time = topic_progress.total_time_minutes
         topic_progress.update_progress(event) # Update the topic data object
 
         # Check threshold
-        settings = self.student_settings_db.get(student_id, StudentProgressSettings(student_id=student_id))
-        threshold = settings.success_threshold
+        threshold = self.student_settings_db.get(student_id, _DEFAULT_SETTINGS).success_threshold
         needs_review = False
         score_for_trigger = None
 
@@ -154,65 +378,107 @@ Generate the summary now:
         # Persist update (in memory for now)
         self.progress_db[student_id][topic_id] = topic_progress
 
-        # Simulate Trigger (remains sync print)
+        # Patch aggregates
+        agg = self._agg[student_id]
+        is_completed = topic_progress.status == "Completed"
+        if is_completed != was_completed:
+            agg["completed"] += 1 if is_completed else -1
+        if len(topic_progress.scores) != prev_score_count:
+            agg["score_sum"] += event.score
+            agg["score_count"] += 1
+        agg["study_time"] += topic_progress.total_time_minutes - prev_time
+        if self._is_weak(topic_progress, threshold):
+            agg["weak"].add(topic_id)
+        else:
+            agg["weak"].discard(topic_id)
+        self._mirror_soa(student_id, topic_progress)
+
+        # Simulate Trigger (logged only)
         if needs_review:
-            print(f"---!!! TRIGGER (SIMULATED for {student_id}) !!!---")
-            reason = f"Score {score_for_trigger:.1f}% < Threshold {threshold:.1f}%." if score_for_trigger is not None else "Status requires review."
-            print(f"  >> Path Agent: Adjustment needed for topic '{topic_id}'. Reason: {reason}")
-            print(f"---!!! END TRIGGER !!!---")
+            # needs_review is only set by a low quiz score, so the score is always there
+            logger.debug("TRIGGER (SIMULATED for %s) >> Path Agent: Adjustment needed for topic '%s'. Reason: Score %.1f%% < Threshold %.1f%%.",
+                         student_id, topic_id, score_for_trigger, threshold)
+        return topic_progress
+
+    async def _generate_insight(self, student_id: str, prompt: str) -> str:
+        """Calls the LLM, coalescing concurrent calls for the same student and prompt into a single request.
+        Keyed on the prompt too, so a summary taken after a write never gets an insight about the data before it."""
+        key = (student_id, prompt)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # Shield so a cancelled waiter doesn't cancel the shared call
+            return await asyncio.shield(inflight)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            try:
+                # *** Use await self.llm.ainvoke ***
+                response = await self.llm.ainvoke(prompt)
+                insight_text = response.content.strip()
+                logger.debug("[Processor] LLM Insight Generated: %s", insight_text)
+            except Exception as e:
+                logger.error("Error generating LLM insight for %s: %s", student_id, e)
+                insight_text = "Could not generate insights at this time due to an error." # Fallback text
+            fut.set_result(insight_text)
+            return insight_text
+        finally:
+            if not fut.done():
+                # We were cancelled mid-call; give the waiters the fallback rather than our cancellation
+                fut.set_result("Could not generate insights at this time due to an error.")
+            del self._inflight[key]
 
     async def get_progress_summary(self, student_id: str) -> ProgressSummaryOutput:
         """Calculates progress summary and generates LLM insights (Async)."""
-        print(f"[Processor] Calculating progress summary for {student_id}")
+        generated_at = datetime.now() # Read the clock once per request
+        logger.debug("[Processor] Calculating progress summary for %s", student_id)
+        async with self._lock_for(student_id):
+            await self._sync_student(student_id)
         # Access internal storage
         student_topic_data = self.progress_db.get(student_id, {})
-        settings = self.student_settings_db.get(student_id, StudentProgressSettings(student_id=student_id))
+        settings = self.student_settings_db.get(student_id, _DEFAULT_SETTINGS)
 
         if not student_topic_data and student_id not in self.student_settings_db:
              # If neither exists, raise error for endpoint to catch
              raise ValueError(f"No progress data or settings found for student {student_id}.")
 
-        # Calculate Metrics (Sync part)
+        # Calculate Metrics (Sync part) - read from the aggregates kept by update_topic_progress
         topics_progress_list = list(student_topic_data.values())
-        identified_weaknesses = []; total_topics = len(topics_progress_list)
-        completed_topics = 0; all_scores = []; total_study_time = 0
-        for topic in topics_progress_list:
-            if topic.status == "Completed": completed_topics += 1
-            if topic.scores: all_scores.extend(topic.scores)
-            total_study_time += topic.total_time_minutes
-            if topic.status == "Needs Review" or (topic.average_score is not None and topic.average_score < settings.success_threshold):
-                identified_weaknesses.append(topic.topic_id)
-        overall_completion = (completed_topics / total_topics * 100) if total_topics > 0 else 0.0
-        overall_avg_score = round(statistics.mean(all_scores), 1) if all_scores else None
+        total_topics = len(topics_progress_list)
+        agg = self._agg[student_id]
+        identified_weaknesses = list(agg["weak"])
+        total_study_time = agg["study_time"]
+        overall_completion = (agg["completed"] / total_topics * 100) if total_topics > 0 else 0.0
+        overall_avg_score = round(agg["score_sum"] / agg["score_count"], 1) if agg["score_count"] else None
+        # Encode the topics before the first await, so queued updates can't land between the metrics and the topics
+        topics_progress = msgspec.to_builtins(topics_progress_list, enc_hook=msgspec_enc_hook)
 
         # Generate LLM Insight (Async part)
         llm_insight_text = None
-        if self.LLM_AVAILABLE and self.llm and self.insight_prompt_template:
-            print(f"[Processor] Attempting LLM insights for {student_id}")
-            topic_breakdown = [f"- {t.topic_id}: Status='{t.status}', Avg Score={t.average_score:.1f}%, Attempts={t.attempts}" if t.average_score is not None else f"- {t.topic_id}: Status='{t.status}', Attempts={t.attempts}" for t in topics_progress_list]
-            topic_breakdown_str = "\n".join(topic_breakdown) if topic_breakdown else "No topic data yet."
+        if self.LLM_AVAILABLE and self.llm:
+            logger.debug("[Processor] Attempting LLM insights for %s", student_id)
+            # Lines are cached on each topic, so unchanged topics cost only the join
+            topic_breakdown_str = "\n".join(t.breakdown_line() for t in topics_progress_list) if topics_progress_list else "No topic data yet."
             try:
-                prompt_filled = self.insight_prompt_template.format(
+                prompt_filled = _INSIGHT_TEMPLATE.format(
                     student_id=student_id, learning_goals=", ".join(settings.learning_goals) or "Not specified",
                     success_threshold=settings.success_threshold, overall_completion_percent=overall_completion,
                     average_score_all_str=f"{overall_avg_score:.1f}%" if overall_avg_score is not None else "N/A",
                     total_study_time_minutes=total_study_time, topic_breakdown_str=topic_breakdown_str
                 )
-                # *** Use await self.llm.ainvoke ***
-                response = await self.llm.ainvoke(prompt_filled)
-                llm_insight_text = response.content.strip()
-                print(f"[Processor] LLM Insight Generated: {llm_insight_text}")
+                llm_insight_text = await self._generate_insight(student_id, prompt_filled)
             except Exception as e:
-                print(f"ERROR generating LLM insight for {student_id}: {e}")
+                logger.error("Error generating LLM insight for %s: %s", student_id, e)
                 llm_insight_text = "Could not generate insights at this time due to an error." # Fallback text
         else:
             llm_insight_text = "LLM insights feature not available." # Fallback text
 
-        return ProgressSummaryOutput(
+        # Everything here comes from already-validated internal models, so skip re-validation
+        return ProgressSummaryOutput.model_construct(
             student_id=student_id, overall_completion_percent=round(overall_completion, 1),
             average_score_all=overall_avg_score, total_study_time_minutes=total_study_time,
-            topics_progress=topics_progress_list, identified_weaknesses=list(set(identified_weaknesses)),
-            llm_insights=llm_insight_text
+            topics_progress=topics_progress, identified_weaknesses=identified_weaknesses,
+            llm_insights=llm_insight_text, generated_at=generated_at
         )
 
 # --- Notes for Future ---
@@ -0,0 +1,81 @@
+# subagents/progress_tracking_agent/storage.py
+
+from typing import Dict, Iterable, Optional, Tuple
+import msgspec
+from redis import asyncio as aioredis
+from redis.exceptions import WatchError
+
+# --- Relative Import for Models ---
+try:
+    from .data_models import StudentProgressSettings, TopicProgressData, msgspec_enc_hook, msgspec_dec_hook
+except ImportError:
+     from data_models import StudentProgressSettings, TopicProgressData, msgspec_enc_hook, msgspec_dec_hook # Fallback
+
+class RedisProgressStore:
+    """Shared progress/settings storage in Redis, so every uvicorn worker sees the same state.
+
+    Keys per student:
+    - ptrack:{student_id}:topics   hash of topic_id -> msgspec-encoded TopicProgressData
+    - ptrack:{student_id}:settings StudentProgressSettings as JSON
+    - ptrack:{student_id}:version  counter bumped on every write, lets workers detect stale local copies
+
+    Writes are optimistic: they only land if the version is still the one the caller last loaded,
+    so concurrent writers can't silently overwrite each other.
+    """
+
+    def __init__(self, redis: aioredis.Redis):
+        self.redis = redis
+        self._encoder = msgspec.json.Encoder(enc_hook=msgspec_enc_hook)
+        self._topic_decoder = msgspec.json.Decoder(TopicProgressData, dec_hook=msgspec_dec_hook)
+
+    @staticmethod
+    def _key(student_id: str, kind: str) -> str:
+        return f"ptrack:{student_id}:{kind}"
+
+    async def get_version(self, student_id: str) -> int:
+        """Current write version for a student (0 if never written)."""
+        version = await self.redis.get(self._key(student_id, "version"))
+        return int(version) if version else 0
+
+    async def load_student(self, student_id: str) -> Tuple[int, Dict[str, TopicProgressData], Optional[StudentProgressSettings]]:
+        """Loads a student's version, topics and settings in one round trip."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.get(self._key(student_id, "version"))
+            pipe.hgetall(self._key(student_id, "topics"))
+            pipe.get(self._key(student_id, "settings"))
+            version, raw_topics, raw_settings = await pipe.execute()
+        topics = {
+            (topic_id.decode() if isinstance(topic_id, bytes) else topic_id): self._topic_decoder.decode(raw)
+            for topic_id, raw in raw_topics.items()
+        }
+        settings = StudentProgressSettings.model_validate_json(raw_settings) if raw_settings else None
+        return int(version) if version else 0, topics, settings
+
+    async def save_topics(self, student_id: str, topics: Iterable[TopicProgressData], expected_version: int) -> Optional[int]:
+        """Writes the given topics if the student is still at expected_version.
+        Returns the new version, or None if another writer got there first."""
+        mapping = {t.topic_id: self._encoder.encode(t) for t in topics}
+        return await self._write_if_version(student_id, expected_version, lambda pipe: pipe.hset(self._key(student_id, "topics"), mapping=mapping))
+
+    async def save_settings(self, settings: StudentProgressSettings, expected_version: int) -> Optional[int]:
+        """Writes a student's settings if the student is still at expected_version.
+        Returns the new version, or None if another writer got there first."""
+        raw = settings.model_dump_json()
+        return await self._write_if_version(settings.student_id, expected_version, lambda pipe: pipe.set(self._key(settings.student_id, "settings"), raw))
+
+    async def _write_if_version(self, student_id: str, expected_version: int, queue_write) -> Optional[int]:
+        """Runs queue_write plus a version bump in a MULTI, guarded by WATCH on the version key."""
+        version_key = self._key(student_id, "version")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(version_key)
+                current = await pipe.get(version_key)
+                if (int(current) if current else 0) != expected_version:
+                    return None
+                pipe.multi()
+                queue_write(pipe)
+                pipe.incr(version_key)
+                _, version = await pipe.execute()
+            except WatchError:
+                return None
+        return version
@@ -0,0 +1,59 @@
+import asyncio
+import random
+
+from data_models import ProgressEventInput, StudentProgressSettings
+from processor import ProgressProcessor
+
+
+def random_events(n, seed=7):
+    rng = random.Random(seed)
+    for _ in range(n):
+        event_type = rng.choice(["quiz_attempted", "quiz_attempted", "topic_completed", "session_duration_minutes", "needs_review", "resource_viewed"])
+        yield ProgressEventInput(
+            student_id="s", topic_id=f"t{rng.randrange(8)}", event_type=event_type,
+            score=rng.randint(0, 100) if event_type == "quiz_attempted" else None,
+            duration_minutes=rng.randint(1, 30) if event_type == "session_duration_minutes" else None,
+        )
+
+
+def brute_force(processor, threshold):
+    """The summary metrics recomputed from scratch over progress_db, as get_progress_summary did before the aggregates."""
+    topics = list(processor.progress_db["s"].values())
+    scores = [score for t in topics for score in t.scores]
+    return {
+        "overall_completion_percent": round(sum(t.status == "Completed" for t in topics) / len(topics) * 100, 1),
+        "average_score_all": round(sum(scores) / len(scores), 1) if scores else None,
+        "total_study_time_minutes": sum(t.total_time_minutes for t in topics),
+        "identified_weaknesses": sorted(
+            t.topic_id for t in topics
+            if t.status == "Needs Review" or (t.average_score is not None and t.average_score < threshold)
+        ),
+    }
+
+
+def test_aggregates_match_brute_force_across_threshold_changes():
+    async def scenario():
+        processor = ProgressProcessor()
+        checks = []
+
+        async def check(threshold):
+            summary = await processor.get_progress_summary("s")
+            checks.append((summary, brute_force(processor, threshold)))
+
+        events = list(random_events(300))
+        for event in events[:150]:
+            await processor.update_topic_progress(event)
+        await check(80.0)
+        for threshold in (95.0, 30.0): # Up, then down: the weak set is re-derived from the SoA columns
+            await processor.save_settings("s", StudentProgressSettings(student_id="s", success_threshold=threshold))
+            await check(threshold)
+            for event in events[150:225] if threshold == 95.0 else events[225:]:
+                await processor.update_topic_progress(event)
+            await check(threshold)
+        return checks
+
+    for summary, expected in asyncio.run(scenario()):
+        assert summary.overall_completion_percent == expected["overall_completion_percent"]
+        assert summary.average_score_all == expected["average_score_all"]
+        assert summary.total_study_time_minutes == expected["total_study_time_minutes"]
+        assert sorted(summary.identified_weaknesses) == expected["identified_weaknesses"]
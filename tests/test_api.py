@@ -0,0 +1,23 @@
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_summary_schema_documents_topic_items():
+    with TestClient(main.app) as client:
+        schemas = client.get("/openapi.json").json()["components"]["schemas"]
+    items = schemas["ProgressSummaryOutput"]["properties"]["topics_progress"]["items"]
+    assert items["title"] == "TopicProgressOut"
+    assert {"topic_id", "status", "scores", "average_score", "last_updated"} <= items["properties"].keys()
+
+
+def test_progress_update_requires_json_content_type():
+    body = '{"student_id": "ct", "topic_id": "t1", "event_type": "topic_started"}'
+    with TestClient(main.app) as client:
+        rejected = client.post("/progress/update", content=body, headers={"Content-Type": "text/plain"})
+        missing = client.post("/progress/update", content=body, headers={"Content-Type": ""})
+        accepted = client.post("/progress/update", content=body, headers={"Content-Type": "application/json; charset=utf-8"})
+    assert rejected.status_code == 422
+    assert rejected.json()["detail"][0]["loc"] == ["body"]
+    assert missing.status_code == 422
+    assert accepted.status_code == 202
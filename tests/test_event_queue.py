@@ -0,0 +1,23 @@
+import asyncio
+
+from data_models import ProgressEventInput
+from processor import ProgressProcessor
+
+
+def test_dead_writer_is_restarted():
+    async def scenario():
+        processor = ProgressProcessor()
+        await processor.enqueue_event(ProgressEventInput(student_id="s", topic_id="t1", event_type="topic_started"))
+        await processor._queue.join()
+
+        async def crash():
+            raise RuntimeError("writer crashed")
+        processor._drain_task.cancel()
+        processor._drain_task = asyncio.create_task(crash())
+        await asyncio.sleep(0)
+
+        await processor.enqueue_event(ProgressEventInput(student_id="s", topic_id="t1", event_type="topic_completed"))
+        await asyncio.wait_for(processor.stop(), timeout=1)
+        return processor.progress_db["s"]["t1"].status
+
+    assert asyncio.run(scenario()) == "Completed"
@@ -0,0 +1,62 @@
+import asyncio
+from types import SimpleNamespace
+
+from data_models import ProgressEventInput
+from processor import ProgressProcessor
+
+
+class SlowLLM:
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(0.2)
+        return SimpleNamespace(content="Keep going!")
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    async def scenario():
+        processor = ProgressProcessor()
+        processor.llm, processor.LLM_AVAILABLE = SlowLLM(), True
+        leader = asyncio.create_task(processor._generate_insight("s", "prompt"))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.create_task(processor._generate_insight("s", "prompt")) # Shares the leader's call
+        await asyncio.sleep(0.05)
+        leader.cancel() # e.g. the leader's client disconnected
+        return await waiter
+
+    assert asyncio.run(scenario()) == "Could not generate insights at this time due to an error."
+
+
+def test_summary_topics_match_its_metrics():
+    async def scenario():
+        processor = ProgressProcessor()
+        await processor.enqueue_event(ProgressEventInput(student_id="s", topic_id="t1", event_type="topic_started"))
+        await processor._queue.join()
+        # Queued just before the summary, so the background writer is ready to run at the summary's first await
+        await processor.enqueue_event(ProgressEventInput(student_id="s", topic_id="t1", event_type="topic_completed"))
+        summary = await processor.get_progress_summary("s")
+        await processor.stop()
+        return summary
+
+    summary = asyncio.run(scenario())
+    completed = [t for t in summary.topics_progress if t["status"] == "Completed"]
+    assert summary.overall_completion_percent == len(completed) / len(summary.topics_progress) * 100
+
+
+def test_summary_after_write_does_not_join_older_insight_call():
+    class EchoLLM:
+        async def ainvoke(self, prompt):
+            await asyncio.sleep(0.2)
+            return SimpleNamespace(content="Completed" if "Status='Completed'" in prompt else "In progress")
+
+    async def scenario():
+        processor = ProgressProcessor()
+        processor.llm, processor.LLM_AVAILABLE = EchoLLM(), True
+        await processor.update_topic_progress(ProgressEventInput(student_id="s", topic_id="t1", event_type="topic_started"))
+        before = asyncio.create_task(processor.get_progress_summary("s"))
+        await asyncio.sleep(0.05)
+        await processor.update_topic_progress(ProgressEventInput(student_id="s", topic_id="t1", event_type="topic_completed"))
+        after = await processor.get_progress_summary("s")
+        return await before, after
+
+    before, after = asyncio.run(scenario())
+    assert before.llm_insights == "In progress"
+    assert after.llm_insights == "Completed"
@@ -0,0 +1,90 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from data_models import ProgressEventInput, StudentProgressSettings
+from processor import ProgressProcessor
+from storage import RedisProgressStore
+
+
+def quiz(score, topic_id="t1", student_id="s"):
+    return ProgressEventInput(student_id=student_id, topic_id=topic_id, event_type="quiz_attempted", score=score)
+
+
+def make_workers(n=2):
+    """n processors sharing one fake Redis, like n uvicorn workers."""
+    server = fakeredis.FakeServer()
+    return [ProgressProcessor(store=RedisProgressStore(fakeredis.FakeAsyncRedis(server=server))) for _ in range(n)]
+
+
+def test_updates_are_visible_across_workers():
+    async def scenario():
+        a, b = make_workers()
+        await a.update_topic_progress(quiz(90))
+        await b.update_topic_progress(quiz(60))
+        await b.update_topic_progress(ProgressEventInput(student_id="s", topic_id="t2", event_type="topic_completed"))
+        await a.save_settings("s", StudentProgressSettings(student_id="s", success_threshold=50))
+        return [await w.get_progress_summary("s") for w in (a, b)], await b.get_settings("s")
+
+    summaries, settings = asyncio.run(scenario())
+    for summary in summaries:
+        assert summary.average_score_all == 75.0
+        assert summary.overall_completion_percent == 50.0
+        assert summary.identified_weaknesses == ["t1"] # Flagged Needs Review by the 60 < 80 score
+        assert summary.topics_progress[0]["scores"] == [90.0, 60.0]
+    assert settings.success_threshold == 50
+
+
+def test_concurrent_writes_to_same_topic_keep_every_score():
+    async def scenario():
+        a, b = make_workers()
+        await a.update_topic_progress(quiz(90))
+
+        # Worker a lands its write after b has applied its event but before b writes to Redis
+        original_save = b.store.save_topics
+        async def save_after_a_writes(*args, **kwargs):
+            b.store.save_topics = original_save
+            await a.update_topic_progress(quiz(10))
+            return await original_save(*args, **kwargs)
+        b.store.save_topics = save_after_a_writes
+        await b.update_topic_progress(quiz(20))
+
+        return [await w.get_progress_summary("s") for w in (a, b)]
+
+    for summary in asyncio.run(scenario()):
+        assert sorted(summary.topics_progress[0]["scores"]) == [10.0, 20.0, 90.0]
+        assert summary.average_score_all == 40.0
+
+
+def test_failed_store_write_forces_reload():
+    async def scenario():
+        a, b = make_workers()
+        await a.update_topic_progress(quiz(50))
+
+        original_save = a.store.save_topics
+        async def failing_save(*args, **kwargs):
+            raise ConnectionError("redis down")
+        a.store.save_topics = failing_save
+        with pytest.raises(ConnectionError):
+            await a.update_topic_progress(quiz(100))
+        a.store.save_topics = original_save
+
+        return [await w.get_progress_summary("s") for w in (a, b)]
+
+    for summary in asyncio.run(scenario()):
+        assert summary.topics_progress[0]["scores"] == [50.0]
+        assert summary.average_score_all == 50.0
+
+
+def test_reads_of_unknown_students_leave_no_locks_behind():
+    async def scenario():
+        a, = make_workers(1)
+        await a.update_topic_progress(quiz(90))
+        for i in range(100):
+            with pytest.raises(ValueError):
+                await a.get_progress_summary(f"unknown-{i}")
+            await a.get_settings(f"unknown-{i}")
+        return a
+
+    assert len(asyncio.run(scenario())._locks) == 0
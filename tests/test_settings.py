@@ -0,0 +1,12 @@
+import asyncio
+
+from processor import ProgressProcessor
+
+
+def test_default_settings_do_not_share_learning_goals():
+    async def scenario():
+        processor = ProgressProcessor()
+        (await processor.get_settings("a")).learning_goals.append("Physics")
+        return await processor.get_settings("b")
+
+    assert asyncio.run(scenario()).learning_goals == []
@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+import main
+
+
+class SlowLLM:
+    """Stands in for the Gemini client; holds each summary open long enough for an update to land."""
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(0.2)
+        return SimpleNamespace(content="Keep going!")
+
+
+def test_update_during_summary_is_not_hidden_by_cache():
+    async def scenario():
+        async with main.lifespan(main.app):
+            processor = main.app.state.processor
+            processor.llm, processor.LLM_AVAILABLE = SlowLLM(), True
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.post("/progress/update", json={"student_id": "cache-race", "topic_id": "t1", "event_type": "topic_started"})
+                await processor._queue.join()
+
+                # The summary is computed before the update and cached after it
+                in_flight = asyncio.create_task(client.get("/progress/cache-race"))
+                await asyncio.sleep(0.05)
+                await client.post("/progress/update", json={"student_id": "cache-race", "topic_id": "t1", "event_type": "topic_completed"})
+                await processor._queue.join()
+                stale = await in_flight
+
+                return stale.json(), (await client.get("/progress/cache-race")).json()
+
+    stale, fresh = asyncio.run(scenario())
+    assert stale["overall_completion_percent"] == 0.0
+    assert fresh["overall_completion_percent"] == 100.0
+
+
+def run_with_client(scenario):
+    async def runner():
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await scenario(client, main.app.state.processor)
+    return asyncio.run(runner())
+
+
+def test_old_generations_do_not_pile_up_in_memory_cache():
+    async def scenario(client, processor):
+        for _ in range(50):
+            await client.post("/progress/update", json={"student_id": "cache-leak", "topic_id": "t1", "event_type": "topic_started"})
+            await processor._queue.join()
+            assert (await client.get("/progress/cache-leak")).status_code == 200
+        return [key for key in main.SweepingInMemoryBackend._store if ":cache-leak:" in key]
+
+    assert len(run_with_client(scenario)) == 1
+
+
+def test_cache_hits_keep_cache_headers():
+    async def scenario(client, processor):
+        await client.post("/progress/update", json={"student_id": "cache-headers", "topic_id": "t1", "event_type": "topic_started"})
+        await processor._queue.join()
+        return await client.get("/progress/cache-headers"), await client.get("/progress/cache-headers")
+
+    miss, hit = run_with_client(scenario)
+    assert miss.headers["X-FastAPI-Cache"] == "MISS"
+    assert hit.headers["X-FastAPI-Cache"] == "HIT"
+    assert hit.headers["ETag"] == miss.headers["ETag"]
+    assert hit.headers["Cache-Control"].startswith("max-age=")
+    assert hit.json() == miss.json()